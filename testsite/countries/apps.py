@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CountriesConfig(AppConfig):
     name = "countries"
+
+    def ready(self):
+        # pylint: disable-next=import-outside-toplevel,unused-import
+        from . import signals  # noqa: F401
@@ -0,0 +1,57 @@
+from typing import Any, Callable
+from urllib.parse import quote
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .singleflight import SingleFlight
+
+DATASET_VERSION_KEY = "countries:dataset-version"
+
+# Entries are keyed by dataset version, so a change never needs them to expire;
+# this only bounds how long an unused entry lingers. Warmed entries must outlive
+# the backend's 300 second default or workers go cold again minutes after start.
+DATASET_CACHE_TIMEOUT = 24 * 60 * 60
+
+single_flight = SingleFlight()
+
+
+def get_dataset_version() -> str:
+    version = cache.get(DATASET_VERSION_KEY)
+    if version is None:
+        cache.add(DATASET_VERSION_KEY, uuid4().hex, timeout=None)
+        version = cache.get(DATASET_VERSION_KEY)
+    return version
+
+
+def bump_dataset_version() -> str:
+    # A fresh random token rather than a counter, so an evicted version key
+    # can never resurrect entries cached under an older dataset.
+    version = uuid4().hex
+    cache.set(DATASET_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def invalidate_dataset():
+    # Bump straight away so this process stops serving stale entries, and
+    # again on commit so readers that cached pre-commit rows under the first
+    # bump are discarded too.
+    bump_dataset_version()
+    transaction.on_commit(bump_dataset_version)
+
+
+def make_key(name: str, version: str | None = None) -> str:
+    # Quoted so names taken from URLs stay valid memcached-style keys.
+    if version is None:
+        version = get_dataset_version()
+    return f"countries:{quote(name, safe=':')}:{version}"
+
+
+def get_or_build(name: str, build: Callable[[], Any]) -> Any:
+    return single_flight.get_or_set(
+        make_key(name),
+        build,
+        stale_key=make_key(name, version="stale"),
+        timeout=DATASET_CACHE_TIMEOUT,
+    )
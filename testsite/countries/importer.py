@@ -0,0 +1,262 @@
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List
+
+from django.db import transaction
+
+from .cache import invalidate_dataset
+from .models import Country, Region, TopLevelDomain
+
+# Keeps every `__in` lookup well under SQLite's bound-parameter limit.
+BATCH_SIZE = 500
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson")
+
+
+@dataclass
+class RecordResult:
+    name: str
+    status: str
+    errors: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, str | List[str]]:
+        result = {"name": self.name, "status": self.status}
+        if self.errors:
+            result["errors"] = self.errors
+        return result
+
+
+@dataclass
+class BatchResult:
+    records: List[RecordResult]
+    created_regions: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        summary = defaultdict(int)
+        for record in self.records:
+            summary[record.status] += 1
+        return {
+            "summary": dict(summary),
+            "results": [record.to_dict() for record in self.records],
+        }
+
+
+def parse_batch(body: bytes, content_type: str) -> List[Any]:
+    """Decodes a JSON array, or NDJSON when ``content_type`` says so."""
+    try:
+        text = body.decode("utf-8")
+        if content_type in NDJSON_CONTENT_TYPES:
+            return [json.loads(line) for line in text.splitlines() if line.strip()]
+        rows = json.loads(text)
+    except (UnicodeDecodeError, json.JSONDecodeError) as error:
+        raise ValueError(f"Malformed request body: {error}") from error
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON array of country records")
+    return rows
+
+
+def _string_errors(row, key, max_length, required=True):
+    value = row.get(key)
+    if value is None:
+        return [f"{key} is required"] if required else []
+    if not isinstance(value, str):
+        return [f"{key} must be a string"]
+    if len(value) > max_length:
+        return [f"{key} must be at most {max_length} characters"]
+    return []
+
+
+def validate_row(row: Any) -> List[str]:
+    if not isinstance(row, dict):
+        return ["record must be an object"]
+
+    errors = _string_errors(row, "name", 100)
+    if not errors and not row["name"]:
+        errors.append("name must not be empty")
+    errors += _string_errors(row, "alpha2Code", 2)
+    errors += _string_errors(row, "alpha3Code", 3)
+    errors += _string_errors(row, "region", 100)
+    errors += _string_errors(row, "capital", 100, required=False)
+
+    population = row.get("population")
+    if isinstance(population, bool) or not isinstance(population, int):
+        errors.append("population must be an integer")
+    elif population < 0:
+        errors.append("population must not be negative")
+
+    tlds = row.get("topLevelDomain")
+    if tlds is not None and (
+        not isinstance(tlds, list)
+        or not all(isinstance(tld, str) and len(tld) <= 64 for tld in tlds)
+    ):
+        errors.append("topLevelDomain must be a list of domain strings")
+    return errors
+
+
+def validate_rows(rows: List[Any]) -> List[List[str]]:
+    errors = []
+    seen = set()
+    for row in rows:
+        row_errors = validate_row(row)
+        if not row_errors:
+            if row["name"] in seen:
+                row_errors.append("name is duplicated in this batch")
+            seen.add(row["name"])
+        errors.append(row_errors)
+    return errors
+
+
+def rejected_batch(rows: List[Any], errors: List[List[str]]) -> BatchResult:
+    return BatchResult(
+        records=[
+            RecordResult(
+                name=row.get("name", "") if isinstance(row, dict) else "",
+                status="invalid" if row_errors else "skipped",
+                errors=row_errors,
+            )
+            for row, row_errors in zip(rows, errors)
+        ]
+    )
+
+
+def chunked(items: Iterable, size: int = BATCH_SIZE) -> Iterator[List]:
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _get_or_create_by_name(model, names):
+    def fetch(wanted):
+        found = {}
+        for batch in chunked(wanted):
+            for obj in model.objects.filter(name__in=batch).order_by("pk"):
+                found.setdefault(obj.name, obj)
+        return found
+
+    objects = fetch(names)
+    missing = sorted(set(names).difference(objects))
+    if missing:
+        model.objects.bulk_create(
+            [model(name=name) for name in missing], batch_size=BATCH_SIZE
+        )
+        # SQLite does not return primary keys from bulk_create.
+        objects.update(fetch(missing))
+    return objects, missing
+
+
+@transaction.atomic
+def upsert_countries(rows: List[Dict[str, Any]]) -> BatchResult:
+    """Applies validated feed records with a fixed number of queries per chunk.
+
+    ``None`` values and a missing ``topLevelDomain`` leave existing data as is.
+    """
+    regions, created_regions = _get_or_create_by_name(
+        Region, {row["region"] for row in rows}
+    )
+    tlds, _ = _get_or_create_by_name(
+        TopLevelDomain,
+        {tld for row in rows for tld in row.get("topLevelDomain") or () if tld},
+    )
+    existing = {}
+    for batch in chunked(sorted({row["name"] for row in rows})):
+        for country in Country.objects.filter(name__in=batch).order_by("pk"):
+            existing.setdefault(country.name, country)
+
+    records, to_create, to_update, updated_fields = _diff_countries(
+        rows, regions, existing
+    )
+    Country.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    if to_update:
+        Country.objects.bulk_update(
+            to_update, sorted(updated_fields), batch_size=BATCH_SIZE
+        )
+    for batch in chunked([country.name for country in to_create]):
+        for country in Country.objects.filter(name__in=batch):
+            existing.setdefault(country.name, country)
+
+    _sync_top_level_domains(rows, records, existing, tlds)
+    if created_regions or any(record.status != "unchanged" for record in records):
+        invalidate_dataset()
+    return BatchResult(records=records, created_regions=created_regions)
+
+
+def _diff_countries(rows, regions, existing):
+    """Splits ``rows`` into new countries and changed ``existing`` ones."""
+    to_create, to_update, updated_fields, records = [], [], set(), []
+    for row in rows:
+        values = {
+            key: row[key]
+            for key in ("alpha2Code", "alpha3Code", "population", "capital")
+            if row.get(key) is not None
+        }
+        values["region_id"] = regions[row["region"]].pk
+        country = existing.get(row["name"])
+        if country is None:
+            to_create.append(Country(name=row["name"], **values))
+            records.append(RecordResult(name=row["name"], status="created"))
+            continue
+
+        changed = [
+            key for key, value in values.items() if getattr(country, key) != value
+        ]
+        for key in changed:
+            setattr(country, key, values[key])
+        if changed:
+            to_update.append(country)
+            updated_fields.update(
+                "region" if key == "region_id" else key for key in changed
+            )
+        records.append(
+            RecordResult(name=row["name"], status="updated" if changed else "unchanged")
+        )
+    return records, to_create, to_update, updated_fields
+
+
+def _linked_tlds(through, country_ids):
+    """Maps each country id to ``{tld_id: link_id}`` for its current links."""
+    current = defaultdict(dict)
+    for batch in chunked(country_ids):
+        links = through.objects.filter(country_id__in=batch).values_list(
+            "pk", "country_id", "topleveldomain_id"
+        )
+        for link_id, country_id, tld_id in links:
+            current[country_id][tld_id] = link_id
+    return current
+
+
+def _diff_tlds(country, names, tlds, linked):
+    """Returns the links to add and the link ids to remove for ``country``."""
+    through = Country.topLevelDomain.through
+    # The feed lists blank domains for some countries, e.g. [""].
+    wanted = {tlds[name].pk for name in names if name}
+    to_add = [
+        through(country_id=country.pk, topleveldomain_id=tld_id)
+        for tld_id in wanted.difference(linked)
+    ]
+    to_remove = [link_id for tld_id, link_id in linked.items() if tld_id not in wanted]
+    return to_add, to_remove
+
+
+def _sync_top_level_domains(rows, records, countries, tlds):
+    through = Country.topLevelDomain.through
+    synced = [
+        (row, record, countries[row["name"]])
+        for row, record in zip(rows, records)
+        if row.get("topLevelDomain") is not None
+    ]
+    current = _linked_tlds(through, [country.pk for _, _, country in synced])
+
+    to_add, to_remove = [], []
+    for row, record, country in synced:
+        added, removed = _diff_tlds(
+            country, row["topLevelDomain"], tlds, current[country.pk]
+        )
+        to_add += added
+        to_remove += removed
+        if (added or removed) and record.status == "unchanged":
+            record.status = "updated"
+
+    through.objects.bulk_create(to_add, batch_size=BATCH_SIZE)
+    for batch in chunked(to_remove):
+        through.objects.filter(pk__in=batch).delete()
@@ -0,0 +1,88 @@
+import os
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| +(\S+)$")
+
+
+def parse_importtime(output):
+    modules = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, module = match.groups()
+            modules.append(
+                {
+                    "module": module,
+                    "self_us": int(self_us),
+                    "cumulative_us": int(cumulative_us),
+                }
+            )
+    return modules
+
+
+class Command(BaseCommand):
+    TARGETS = {
+        "manage": [os.path.join(settings.BASE_DIR, "manage.py"), "check"],
+        "wsgi": ["-c", "import testsite.wsgi"],
+    }
+    SORT_KEYS = ("self", "cumulative")
+    help = "Reports a per-module import-time breakdown for manage.py and wsgi.py"
+
+    def add_arguments(self, parser):
+        parser.add_argument("targets", nargs="*", help="manage, wsgi (default: both)")
+        parser.add_argument("--limit", type=int, default=25)
+        parser.add_argument("--sort", choices=self.SORT_KEYS, default="self")
+
+    def profile(self, target):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", *self.TARGETS[target]],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        elapsed = time.perf_counter() - started
+        if result.returncode:
+            raise CommandError(
+                f"{target} exited with {result.returncode}:\n{result.stderr}"
+            )
+        return parse_importtime(result.stderr), elapsed
+
+    def handle(self, *args, **options):
+        targets = options["targets"] or list(self.TARGETS)
+        unknown = set(targets).difference(self.TARGETS)
+        if unknown:
+            raise CommandError(f"Unknown target(s): {', '.join(sorted(unknown))}")
+
+        sort_key = f"{options['sort']}_us"
+        for target in targets:
+            modules, elapsed = self.profile(target)
+            total_us = sum(module["self_us"] for module in modules)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "{}: {} modules, {:.1f}ms importing, {:.1f}ms wall".format(
+                        target, len(modules), total_us / 1000, elapsed * 1000
+                    )
+                )
+            )
+            self.stdout.write(
+                "{:>10} {:>12}  {}".format("self ms", "cumul. ms", "module")
+            )
+            ranked = sorted(modules, key=lambda module: module[sort_key], reverse=True)
+            for module in ranked[: options["limit"]]:
+                self.stdout.write(
+                    "{:>10.1f} {:>12.1f}  {}".format(
+                        module["self_us"] / 1000,
+                        module["cumulative_us"] / 1000,
+                        module["module"],
+                    )
+                )
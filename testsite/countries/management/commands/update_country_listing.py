@@ -1,7 +1,7 @@
 import requests
 from django.core.management.base import BaseCommand
 
-from countries.models import Country, Region, TopLevelDomain
+from countries.importer import upsert_countries, validate_rows
 
 
 class Command(BaseCommand):
@@ -16,61 +16,27 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         data = self.get_data()
-        for row in data:
-            region, region_created = Region.objects.get_or_create(name=row["region"])
-            if region_created:
+
+        rows = []
+        for row, errors in zip(data, validate_rows(data)):
+            if errors:
                 self.stdout.write(
-                    self.style.SUCCESS("Region: {} - Created".format(region))
+                    self.style.ERROR(
+                        "{} - Skipped: {}".format(
+                            row.get("name") if isinstance(row, dict) else row,
+                            "; ".join(errors),
+                        )
+                    )
                 )
+            else:
+                rows.append(row)
 
-            country, country_created = Country.objects.get_or_create(
-                name=row["name"],
-                defaults={
-                    "alpha2Code": row["alpha2Code"],
-                    "alpha3Code": row["alpha3Code"],
-                    "population": row["population"],
-                    "capital": row["capital"],
-                    "region": region,
-                },
-            )
-
-            if country_created:
-                self.stdout.write(self.style.SUCCESS("Country: {} - Created".format(country)))
-
-            fields_to_update = [
-                x
-                for x in Country._meta.fields
-                if not x.primary_key
-                and x.name in row
-                and getattr(country, x.name) != row[x.name]
-                and row[x.name] is not None
-            ]
-
-            # Update country changes
-            for field in fields_to_update:
-                value = region if field.name == "region" else row.get(field.name)
-                setattr(country, field.name, value)
-
-            # Update topLevelDomain entries
-            data_tld_set = set(row['topLevelDomain'])
-            tld_set = set(tld.name for tld in country.topLevelDomain.all())
-            if data_tld_set != tld_set:
-                tlds_to_add = data_tld_set.difference(tld_set)
-                tlds_to_remove = tld_set.difference(data_tld_set)
-                if tlds_to_remove:
-                    country.topLevelDomain.filter(name__in=tlds_to_remove).delete()
-
-                for tld in tlds_to_add:
-                    new_tld, _ = TopLevelDomain.objects.get_or_create(name=tld)
-                    country.topLevelDomain.add(new_tld)
-
-            if not country_created or fields_to_update:
-                country.save()
-
+        result = upsert_countries(rows)
+        for region in result.created_regions:
+            self.stdout.write(self.style.SUCCESS("Region: {} - Created".format(region)))
+        for record in result.records:
             self.stdout.write(
                 self.style.SUCCESS(
-                    "{} - {}".format(
-                        country, "Created" if country_created else "Updated"
-                    )
+                    "{} - {}".format(record.name, record.status.capitalize())
                 )
             )
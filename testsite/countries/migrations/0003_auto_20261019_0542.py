@@ -0,0 +1,17 @@
+# Generated by Django 2.2.17 on 2026-10-19 05:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('countries', '0002_auto_20250908_0211'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='country',
+            index=models.Index(fields=['region', 'name'], name='countries_c_region__b51cab_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.17 on 2026-10-19 06:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('countries', '0003_auto_20261019_0542'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='country',
+            index=models.Index(fields=['name'], name='countries_c_name_67e711_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='region',
+            index=models.Index(fields=['name'], name='countries_r_name_77408c_idx'),
+        ),
+        # name__iexact is LIKE on SQLite, which can only use a NOCASE index.
+        # Django 2.2 indexes cannot declare a collation, so these are raw SQL.
+        migrations.RunSQL(
+            'CREATE INDEX "countries_country_name_nocase" '
+            'ON "countries_country" ("name" COLLATE NOCASE)',
+            'DROP INDEX "countries_country_name_nocase"',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX "countries_region_name_nocase" '
+            'ON "countries_region" ("name" COLLATE NOCASE)',
+            'DROP INDEX "countries_region_name_nocase"',
+        ),
+    ]
@@ -1,8 +1,10 @@
 from dataclasses import dataclass
-from typing import Dict, List
+from math import ceil
+from typing import Any, Dict, List
 
+from django.core.paginator import EmptyPage
 from django.db import models
-from django.db.models import Count, Sum
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
 from django.db.models.query import QuerySet
 
 
@@ -21,12 +23,32 @@ class RegionStats:
 
 
 class RegionQuerySet(QuerySet):
+    def with_stats(self) -> "RegionQuerySet":
+        return self.annotate(
+            number_countries=Count("countries"),
+            total_population=Sum("countries__population"),
+        )
+
+    def with_region_stats(self) -> "RegionQuerySet":
+        """Like with_stats(), without the GROUP BY that makes SQLite scan every
+        region even when the query filters by an indexed name."""
+        countries = (
+            Country.objects.filter(region=OuterRef("pk")).order_by().values("region")
+        )
+        return self.annotate(
+            number_countries=Subquery(
+                countries.annotate(number=Count("pk")).values("number"),
+                output_field=IntegerField(),
+            ),
+            total_population=Subquery(
+                countries.annotate(total=Sum("population")).values("total"),
+                output_field=IntegerField(),
+            ),
+        )
+
     def get_stats(self) -> List[RegionStats]:
         queryset = (
-            self.annotate(
-                number_countries=Count("countries"),
-                total_population=Sum("countries__population"),
-            )
+            self.with_stats()
             .values("name", "number_countries", "total_population")
             .order_by("name")
         )
@@ -39,14 +61,71 @@ class RegionQuerySet(QuerySet):
             for region in queryset
         ]
 
+    def get_detail(
+        self, name: str, page: int = 1, page_size: int | None = None
+    ) -> Dict[str, Any]:
+        region = self.with_region_stats().get(name__iexact=name)
+        stats = RegionStats(
+            name=region.name,
+            number_countries=region.number_countries or 0,
+            total_population=region.total_population or 0,
+        )
+        # Served by the (region, name) index, so SQLite needs no sort step.
+        countries = (
+            region.countries.select_related("region")
+            .prefetch_related("topLevelDomain")
+            .order_by("name")
+        )
+        response = {}
+        if page_size:
+            # As Paginator with allow_empty_first_page: an empty region still
+            # has one, empty, page.
+            num_pages = max(ceil(stats.number_countries / page_size), 1)
+            # Checked before slicing: SQLite rejects offsets past 64 bits.
+            if page > num_pages:
+                raise EmptyPage(f"Page {page} is past the last page, {num_pages}")
+            countries = countries[(page - 1) * page_size : page * page_size]
+            response["pagination"] = {
+                "page": page,
+                "page_size": page_size,
+                "num_pages": num_pages,
+            }
+        response["region"] = {
+            **stats.to_dict(),
+            "countries": [country.to_dict() for country in countries],
+        }
+        return response
+
 
 class RegionManager(models.Manager):
     def get_queryset(self) -> RegionQuerySet:
         return RegionQuerySet(self.model, using=self._db)
 
+    def with_region_stats(self) -> "RegionQuerySet":
+        """Like with_stats(), without the GROUP BY that makes SQLite scan every
+        region even when the query filters by an indexed name."""
+        countries = (
+            Country.objects.filter(region=OuterRef("pk")).order_by().values("region")
+        )
+        return self.annotate(
+            number_countries=Subquery(
+                countries.annotate(number=Count("pk")).values("number"),
+                output_field=IntegerField(),
+            ),
+            total_population=Subquery(
+                countries.annotate(total=Sum("population")).values("total"),
+                output_field=IntegerField(),
+            ),
+        )
+
     def get_stats(self) -> List[RegionStats]:
         return self.get_queryset().get_stats()
 
+    def get_detail(
+        self, name: str, page: int = 1, page_size: int | None = None
+    ) -> Dict[str, Any]:
+        return self.get_queryset().get_detail(name, page, page_size)
+
     def to_dict(self) -> Dict[str, List[Dict[str, int | str]]]:
         return {"regions": [region.to_dict() for region in self.get_stats()]}
 
@@ -55,6 +134,9 @@ class Region(models.Model):
     objects = RegionManager()
     name = models.CharField(max_length=100)
 
+    class Meta:
+        indexes = [models.Index(fields=["name"])]
+
     def __str__(self):
         return str(self.name)
 
@@ -81,6 +163,12 @@ class Country(models.Model):
 
     topLevelDomain = models.ManyToManyField(TopLevelDomain, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["region", "name"]),
+            models.Index(fields=["name"]),
+        ]
+
     def to_dict(self) -> Dict[str, int | str | List[str]]:
         return {
             "name": self.name,
@@ -0,0 +1,129 @@
+import json
+import os
+import re
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Set, Tuple
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "query_budgets.json")
+
+# Set to rewrite the baseline from the current measurements instead of
+# asserting against it.
+UPDATE_BASELINE_ENV = "UPDATE_QUERY_BUDGETS"
+
+EXPLAINED_STATEMENTS = ("SELECT", "UPDATE", "DELETE")
+
+# "SCAN TABLE t" before SQLite 3.36, "SCAN t" since; both may carry a
+# "USING [COVERING] INDEX" suffix, which is still a full pass.
+SCAN_DETAIL = re.compile(r"^SCAN (?:TABLE )?([A-Za-z_]\w*)\b")
+
+# Captured SQL has its parameters inlined; these reduce it to a shape that is
+# the same for every run and dataset size.
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LIST = re.compile(r"IN \((?:\?, )*\?\)")
+
+# Scenarios already rebuilt by this run in update mode.
+_rebuilt_scenarios: Set[str] = set()
+
+
+def statement_shape(sql: str) -> str:
+    return IN_LIST.sub("IN (...)", LITERAL.sub("?", sql))
+
+
+class QueryBudget(CaptureQueriesContext):
+    """Captures the queries run inside the block and their SQLite plans."""
+
+    def __init__(self, using: str = DEFAULT_DB_ALIAS):
+        super().__init__(connections[using])
+        self.plans: List[Tuple[str, List[str]]] = []
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is None and self.connection.vendor == "sqlite":
+            self.plans = [(sql, self.explain(sql)) for sql in self.statements]
+
+    @property
+    def statements(self) -> List[str]:
+        return [query["sql"] for query in self.captured_queries]
+
+    def explain(self, sql: str) -> List[str]:
+        if not sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+            return []
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+
+    @property
+    def scans_by_shape(self) -> Dict[str, Set[str]]:
+        scans = defaultdict(set)
+        for sql, plan in self.plans:
+            for detail in plan:
+                match = SCAN_DETAIL.match(detail)
+                if match and match.group(1) != "CONSTANT":
+                    scans[statement_shape(sql)].add(match.group(1))
+        return dict(scans)
+
+    @property
+    def scans(self) -> Set[str]:
+        return set().union(*self.scans_by_shape.values())
+
+    def report(self) -> str:
+        return "\n".join(
+            "{}\n    {}".format(sql, "\n    ".join(plan)) for sql, plan in self.plans
+        )
+
+
+def load_baseline() -> Dict[str, Dict]:
+    with open(BASELINE_PATH, encoding="utf-8") as baseline_file:
+        return json.load(baseline_file)
+
+
+def _update_baseline(scenario, size, budget):
+    baseline = load_baseline()
+    if scenario not in _rebuilt_scenarios:
+        # Start from this run's measurements so regenerating can also tighten.
+        baseline[scenario] = {"queries": {}, "scans": {}}
+        _rebuilt_scenarios.add(scenario)
+    entry = baseline[scenario]
+    entry["queries"][str(size)] = len(budget)
+    for shape, tables in budget.scans_by_shape.items():
+        entry["scans"][shape] = sorted(tables.union(entry["scans"].get(shape, ())))
+    with open(BASELINE_PATH, "w", encoding="utf-8") as baseline_file:
+        json.dump(baseline, baseline_file, indent=4, sort_keys=True)
+        baseline_file.write("\n")
+
+
+@contextmanager
+def assert_query_budget(testcase, scenario: str, size: int):
+    """Fails ``testcase`` if the block exceeds the committed budget.
+
+    The block may run at most as many queries as ``query_budgets.json``
+    records for ``scenario`` at ``size`` rows, and each statement may only
+    scan the tables recorded for its shape.
+    """
+    with QueryBudget() as budget:
+        yield budget
+
+    if os.environ.get(UPDATE_BASELINE_ENV):
+        _update_baseline(scenario, size, budget)
+        return
+
+    entry = load_baseline()[scenario]
+    testcase.assertLessEqual(
+        len(budget),
+        entry["queries"][str(size)],
+        f"{scenario} at {size} rows exceeded its query budget:\n{budget.report()}",
+    )
+    unexpected = {
+        shape: sorted(tables.difference(entry["scans"].get(shape, ())))
+        for shape, tables in budget.scans_by_shape.items()
+    }
+    unexpected = "\n".join(
+        f"{tables} in {shape}" for shape, tables in unexpected.items() if tables
+    )
+    testcase.assertFalse(
+        unexpected, f"{scenario} at {size} rows has unexpected scans:\n{unexpected}"
+    )
@@ -0,0 +1,94 @@
+import gzip
+import json
+from typing import Any, Callable, Dict
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .cache import get_or_build
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Same threshold as GZipMiddleware: below this the headers outweigh the saving.
+MIN_COMPRESS_LENGTH = 200
+
+# Preferred order when the client accepts several encodings equally.
+ENCODINGS = ("br", "gzip", "identity")
+
+
+def encode_variants(payload: Any) -> Dict[str, bytes]:
+    body = json.dumps(payload, cls=DjangoJSONEncoder).encode("utf-8")
+    variants = {"identity": body}
+    if len(body) < MIN_COMPRESS_LENGTH:
+        return variants
+
+    compressed = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed["br"] = brotli.compress(body, mode=brotli.MODE_TEXT, quality=11)
+    variants.update(
+        (encoding, data)
+        for encoding, data in compressed.items()
+        if len(data) < len(body)
+    )
+    return variants
+
+
+def get_encoded_variants(
+    name: str, build_payload: Callable[[], Any]
+) -> Dict[str, bytes]:
+    return get_or_build(f"{name}:encoded", lambda: encode_variants(build_payload()))
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(variants: Dict[str, bytes], accept_encoding: str) -> str:
+    accepted = parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = "identity", 0.0
+    for encoding in ENCODINGS:
+        if encoding not in variants:
+            continue
+        if encoding == "identity":
+            # identity is acceptable unless explicitly refused (RFC 9110 12.5.3).
+            quality = accepted.get("identity", wildcard if "*" in accepted else 1.0)
+        else:
+            quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def precompressed_json_response(
+    request, name: str, build_payload: Callable[[], Any]
+) -> HttpResponse:
+    variants = get_encoded_variants(name, build_payload)
+    encoding = choose_encoding(variants, request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    body = variants[encoding]
+
+    response = HttpResponse(body, content_type="application/json")
+    if encoding != "identity":
+        response["Content-Encoding"] = encoding
+    response["Content-Length"] = str(len(body))
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
@@ -0,0 +1,21 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_dataset
+from .models import Country, Region, TopLevelDomain
+
+
+@receiver(post_save, sender=Region)
+@receiver(post_save, sender=Country)
+@receiver(post_save, sender=TopLevelDomain)
+@receiver(post_delete, sender=Region)
+@receiver(post_delete, sender=Country)
+@receiver(post_delete, sender=TopLevelDomain)
+def dataset_saved_or_deleted(**_):
+    invalidate_dataset()
+
+
+@receiver(m2m_changed, sender=Country.topLevelDomain.through)
+def country_tlds_changed(action, **_):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_dataset()
@@ -0,0 +1,130 @@
+import fcntl
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent cache misses so each key is computed only once.
+
+    Threads in a process share the leader's result directly. Across processes
+    the leader holds an exclusive ``flock`` on one of ``LOCK_STRIPES`` files
+    in ``lock_dir``, which the kernel grants atomically and releases if the
+    holder dies. Other processes serve the value stored under ``stale_key``
+    if there is one, otherwise they wait for the leader's value, and after
+    ``lock_timeout`` compute it themselves.
+    """
+
+    LOCK_STRIPES = 64
+
+    def __init__(
+        self,
+        lock_dir: Optional[str] = None,
+        lock_timeout: float = 30,
+        poll_interval: float = 0.05,
+        stale_timeout: float = 3600,
+    ):
+        self.lock_dir = lock_dir
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.stale_timeout = stale_timeout
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def get_or_set(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        stale_key: Optional[str] = None,
+        timeout=DEFAULT_TIMEOUT,
+    ) -> Any:
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = self._get_or_set_locked(key, compute, stale_key, timeout)
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def lock_path(self, key: str) -> str:
+        # A fixed set of files, reused and never deleted: unlinking a flock
+        # file lets a later process lock a fresh inode while the old one is
+        # still held.
+        lock_dir = self.lock_dir or settings.SINGLE_FLIGHT_LOCK_DIR
+        stripe = int(hashlib.sha1(key.encode()).hexdigest(), 16) % self.LOCK_STRIPES
+        return os.path.join(lock_dir, f"{stripe:02}.lock")
+
+    def _get_or_set_locked(self, key, compute, stale_key, timeout):
+        path = self.lock_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lock_fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            deadline = time.monotonic() + self.lock_timeout
+            while not _try_lock(lock_fd):
+                if stale_key is not None:
+                    stale = cache.get(stale_key)
+                    if stale is not None:
+                        return stale
+                if time.monotonic() >= deadline:
+                    # The holder is too slow; compute rather than wait forever.
+                    return self._compute(key, compute, stale_key, timeout)
+                time.sleep(self.poll_interval)
+                value = cache.get(key)
+                if value is not None:
+                    return value
+
+            # Another process may have stored the value between our miss and
+            # taking the lock.
+            value = cache.get(key)
+            if value is None:
+                value = self._compute(key, compute, stale_key, timeout)
+            return value
+        finally:
+            os.close(lock_fd)
+
+    def _compute(self, key, compute, stale_key, timeout):
+        value = compute()
+        cache.set(key, value, timeout)
+        if stale_key is not None:
+            cache.set(stale_key, value, self.stale_timeout)
+        return value
+
+
+def _try_lock(lock_fd: int) -> bool:
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
@@ -0,0 +1,164 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+
+from countries.importer import upsert_countries
+from countries.models import Country, Region, TopLevelDomain
+from countries.querybudget import (
+    UPDATE_BASELINE_ENV,
+    QueryBudget,
+    assert_query_budget,
+    statement_shape,
+)
+from countries.tests import TEST_CACHES, TEST_LOCK_DIR, make_row
+
+
+@override_settings(CACHES=TEST_CACHES, SINGLE_FLIGHT_LOCK_DIR=TEST_LOCK_DIR)
+class QueryBudgetTests(TestCase):
+    SIZES = (10, 100, 1000)
+
+    def setUp(self):
+        self.client = Client()
+
+    def populate(self, size):
+        upsert_countries([make_row(index) for index in range(size)])
+        return Country.objects.get(name="Country 1")
+
+    def clear(self):
+        Country.objects.all().delete()
+        Region.objects.all().delete()
+        TopLevelDomain.objects.all().delete()
+
+    # Unit Test: Test QueryBudget captures plans and detects table scans
+    def test_query_budget_detects_scans(self):
+        with QueryBudget() as budget:
+            list(Country.objects.filter(capital="Abuja"))
+            list(Country.objects.filter(pk=1))
+        self.assertEqual(len(budget), 2)
+        self.assertEqual(len(budget.plans), 2)
+        self.assertEqual(budget.scans, {"countries_country"})
+
+    # Unit Test: Test assert_query_budget fails on budget or scan regressions
+    @patch.dict(os.environ, {UPDATE_BASELINE_ENV: ""})
+    def test_assert_query_budget_fails(self):
+        with patch(
+            "countries.querybudget.load_baseline",
+            return_value={"test": {"queries": {"1": 1}, "scans": {}}},
+        ):
+            with self.assertRaises(AssertionError):
+                with assert_query_budget(self, "test", 1):
+                    list(Region.objects.all())
+                    list(Region.objects.all())
+            with self.assertRaisesRegex(AssertionError, "countries_region"):
+                with assert_query_budget(self, "test", 1):
+                    list(Region.objects.all())
+
+    # Unit Test: Test scans are allowed per statement shape, not per table
+    @patch.dict(os.environ, {UPDATE_BASELINE_ENV: ""})
+    def test_assert_query_budget_scans_per_statement(self):
+        with QueryBudget() as budget:
+            list(Country.objects.filter(capital="Abuja"))
+        shape = statement_shape(budget.statements[0])
+        baseline = {
+            "test": {"queries": {"1": 1}, "scans": {shape: ["countries_country"]}}
+        }
+        with patch("countries.querybudget.load_baseline", return_value=baseline):
+            with assert_query_budget(self, "test", 1):
+                list(Country.objects.filter(capital="Accra"))
+            with self.assertRaisesRegex(AssertionError, "unexpected scans"):
+                with assert_query_budget(self, "test", 1):
+                    list(Country.objects.filter(alpha2Code="NG"))
+
+    # Unit Test: Test statement shapes ignore literals and IN list lengths
+    def test_statement_shape(self):
+        self.assertEqual(
+            statement_shape(
+                "SELECT 1 FROM t WHERE a IN (1, 'x''y', 3) AND b = 'c' LIMIT 21"
+            ),
+            "SELECT ? FROM t WHERE a IN (...) AND b = ? LIMIT ?",
+        )
+
+    # Unit Test: Test regenerating the baseline replaces the old measurements
+    @patch.dict(os.environ, {UPDATE_BASELINE_ENV: "1"})
+    def test_update_baseline_rebuilds(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as baseline:
+            json.dump(
+                {"test": {"queries": {"1": 9, "2": 9}, "scans": {"old": ["t"]}}},
+                baseline,
+            )
+        self.addCleanup(os.remove, baseline.name)
+        with patch("countries.querybudget.BASELINE_PATH", baseline.name), patch(
+            "countries.querybudget._rebuilt_scenarios", set()
+        ):
+            with assert_query_budget(self, "test", 1):
+                list(Region.objects.filter(pk=1))
+        with open(baseline.name, encoding="utf-8") as baseline_file:
+            self.assertEqual(
+                json.load(baseline_file), {"test": {"queries": {"1": 1}, "scans": {}}}
+            )
+
+    # Unit Test: Test stats view query budget
+    def test_stats_budget(self):
+        for size in self.SIZES:
+            with self.subTest(size=size):
+                self.populate(size)
+                with assert_query_budget(self, "stats", size):
+                    response = self.client.get("/countries/stats/")
+                self.assertEqual(response.status_code, 200)
+                self.clear()
+
+    # Unit Test: Test country detail view query budgets
+    def test_detail_budget(self):
+        for size in self.SIZES:
+            with self.subTest(size=size):
+                country = self.populate(size)
+                with assert_query_budget(self, "detail_by_id", size):
+                    response = self.client.get(f"/countries/id:{country.pk}/")
+                self.assertEqual(response.json()["country"]["topLevelDomain"], [".c1"])
+                with assert_query_budget(self, "detail_by_name", size):
+                    response = self.client.get("/countries/name:country 1/")
+                self.assertEqual(response.status_code, 200)
+                self.clear()
+
+    # Unit Test: Test region detail view query budget, sorted by index
+    def test_region_detail_budget(self):
+        for size in self.SIZES:
+            with self.subTest(size=size):
+                self.populate(size)
+                for query, scenario in (
+                    ("", "region_detail"),
+                    ("?page=2&page_size=1", "region_detail_page"),
+                ):
+                    with assert_query_budget(self, scenario, size) as budget:
+                        response = self.client.get(
+                            f"/countries/region:region 1/{query}"
+                        )
+                    self.assertEqual(response.status_code, 200)
+                    self.assertFalse(
+                        [
+                            sql
+                            for sql, plan in budget.plans
+                            if any("TEMP B-TREE" in detail for detail in plan)
+                        ],
+                        budget.report(),
+                    )
+                self.clear()
+
+    # Unit Test: Test update_country_listing query budget
+    @patch("countries.management.commands.update_country_listing.Command.get_data")
+    def test_import_budget(self, mock_get_data):
+        for size in self.SIZES:
+            with self.subTest(size=size):
+                self.populate(size // 2)
+                mock_get_data.return_value = [
+                    make_row(index, population=index % 3) for index in range(size)
+                ]
+                with assert_query_budget(self, "import", size):
+                    call_command("update_country_listing", stdout=StringIO())
+                self.assertEqual(Country.objects.count(), size)
+                self.clear()
@@ -0,0 +1,235 @@
+import json
+import os
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+
+from countries.importer import upsert_countries
+from countries.models import Country, TopLevelDomain
+from countries.tests import TEST_CACHES, TEST_LOCK_DIR, make_row
+
+FEED_PATH = os.path.join(settings.BASE_DIR, os.pardir, "data", "countries.json")
+
+
+@override_settings(
+    CACHES=TEST_CACHES,
+    SINGLE_FLIGHT_LOCK_DIR=TEST_LOCK_DIR,
+    COUNTRIES_API_TOKEN="secret",
+)
+class UpsertApiTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.url = "/countries/upsert/"
+        # In the feed's field order.
+        self.nigeria = make_row(
+            0,
+            name="Nigeria",
+            topLevelDomain=[".ng"],
+            alpha2Code="NG",
+            alpha3Code="NGA",
+            capital="Abuja",
+            region="Africa",
+            population=200000,
+        )
+        upsert_countries([self.nigeria])
+        self.country = Country.objects.get(name="Nigeria")
+        self.region = self.country.region
+
+    def post(self, data, content_type="application/json", token="secret"):
+        return self.client.post(
+            self.url,
+            data,
+            content_type=content_type,
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+
+    # Unit Test: Test upsert requires a valid token
+    def test_upsert_unauthorized(self):
+        response = self.post(json.dumps([self.nigeria]), token="wrong")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["WWW-Authenticate"], "Bearer")
+        with override_settings(COUNTRIES_API_TOKEN=""):
+            self.assertEqual(self.post("[]", token="").status_code, 401)
+
+    # Unit Test: Test upsert only accepts POST
+    def test_upsert_get_not_allowed(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+    # Unit Test: Test upsert creates, updates and leaves unchanged records
+    def test_upsert_json(self):
+        records = [
+            self.nigeria,
+            {**self.nigeria, "name": "Ghana", "alpha2Code": "GH", "capital": None},
+            make_row(1),
+        ]
+        response = self.post(json.dumps(records))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "summary": {"unchanged": 1, "created": 2},
+                "results": [
+                    {"name": "Nigeria", "status": "unchanged"},
+                    {"name": "Ghana", "status": "created"},
+                    {"name": "Country 1", "status": "created"},
+                ],
+            },
+        )
+        ghana = Country.objects.get(name="Ghana")
+        self.assertEqual(ghana.capital, "")
+        self.assertEqual(ghana.region, self.region)
+        self.assertEqual(
+            Country.objects.get(name="Country 1").to_dict()["topLevelDomain"], [".c1"]
+        )
+
+    # Unit Test: Test upsert updates fields and top-level domains
+    def test_upsert_updates(self):
+        nigeria = {
+            **self.nigeria,
+            "population": 210000,
+            "region": "West Africa",
+            "topLevelDomain": [".com"],
+        }
+        response = self.post(json.dumps([nigeria]))
+        self.assertEqual(
+            response.json()["results"], [{"name": "Nigeria", "status": "updated"}]
+        )
+        self.country.refresh_from_db()
+        self.assertEqual(self.country.population, 210000)
+        self.assertEqual(self.country.region.name, "West Africa")
+        self.assertEqual(self.country.to_dict()["topLevelDomain"], [".com"])
+        # The unlinked TLD itself is kept, only the link is removed.
+        self.assertTrue(TopLevelDomain.objects.filter(name=".ng").exists())
+
+        tlds_only = {**nigeria, "capital": None, "topLevelDomain": [".ng"]}
+        response = self.post(json.dumps([tlds_only]))
+        self.assertEqual(
+            response.json()["results"], [{"name": "Nigeria", "status": "updated"}]
+        )
+        self.country.refresh_from_db()
+        self.assertEqual(self.country.capital, "Abuja")
+        self.assertEqual(self.country.to_dict()["topLevelDomain"], [".ng"])
+
+    # Unit Test: Test upsert accepts NDJSON
+    def test_upsert_ndjson(self):
+        body = "\n".join(json.dumps(make_row(index)) for index in range(3)) + "\n"
+        response = self.post(body, content_type="application/x-ndjson")
+        self.assertEqual(response.json()["summary"], {"created": 3})
+        self.assertEqual(Country.objects.filter(name__startswith="Country").count(), 3)
+
+    # Unit Test: Test an invalid record rejects the whole batch
+    def test_upsert_invalid_batch(self):
+        records = [
+            make_row(1),
+            make_row(2, population="many", alpha2Code="TOO"),
+            make_row(1),
+            "Nigeria",
+        ]
+        response = self.post(json.dumps(records))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {"name": "Country 1", "status": "skipped"},
+                {
+                    "name": "Country 2",
+                    "status": "invalid",
+                    "errors": [
+                        "alpha2Code must be at most 2 characters",
+                        "population must be an integer",
+                    ],
+                },
+                {
+                    "name": "Country 1",
+                    "status": "invalid",
+                    "errors": ["name is duplicated in this batch"],
+                },
+                {
+                    "name": "",
+                    "status": "invalid",
+                    "errors": ["record must be an object"],
+                },
+            ],
+        )
+        self.assertFalse(Country.objects.filter(name__startswith="Country").exists())
+
+    # Unit Test: Test malformed bodies are rejected
+    def test_upsert_malformed(self):
+        self.assertEqual(self.post("{").status_code, 400)
+        response = self.post(json.dumps(self.nigeria))
+        self.assertEqual(
+            response.json(), {"error": "Expected a JSON array of country records"}
+        )
+
+    # Unit Test: Test a large batch takes a bounded number of queries
+    def test_upsert_large_batch(self):
+        records = [make_row(index) for index in range(2000)]
+        with self.assertNumQueries(37):
+            response = self.post(json.dumps(records))
+        self.assertEqual(response.json()["summary"], {"created": 2000})
+
+        records = [make_row(index, population=index + 1) for index in range(2000)]
+        with self.assertNumQueries(22):
+            response = self.post(json.dumps(records))
+        self.assertEqual(response.json()["summary"], {"updated": 2000})
+        self.assertEqual(Country.objects.get(name="Country 1999").population, 2000)
+
+    # Unit Test: Test a batch of full feed records larger than Django's upload limit
+    @skipUnless(os.path.exists(FEED_PATH), "data/countries.json is not available")
+    def test_upsert_full_feed_records(self):
+        with open(FEED_PATH, encoding="utf-8") as feed_file:
+            feed = json.load(feed_file)
+        records = [
+            {**record, "name": f"{record['name']} {index}"}
+            for index in range(13)
+            for record in feed
+        ][:3000]
+        body = json.dumps(records)
+        self.assertGreater(len(body), settings.DATA_UPLOAD_MAX_MEMORY_SIZE)
+        response = self.post(body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["summary"], {"created": 3000})
+
+    # Unit Test: Test upsert rejects a body over COUNTRIES_UPSERT_MAX_BYTES
+    def test_upsert_too_large(self):
+        with override_settings(COUNTRIES_UPSERT_MAX_BYTES=100):
+            response = self.post(json.dumps([self.nigeria]))
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(
+            response.json(), {"error": "Request body is larger than 100 bytes"}
+        )
+        self.assertEqual(Country.objects.count(), 1)
+
+    # Unit Test: Test upsert invalidates cached responses
+    def test_upsert_invalidates_cache(self):
+        self.client.get("/countries/stats/")
+        self.post(json.dumps([{**self.nigeria, "population": 1}]))
+        response = self.client.get("/countries/stats/")
+        self.assertEqual(response.json()["regions"][0]["total_population"], 1)
+
+    # Unit Test: Test update_country_listing imports through the same upsert
+    @patch("countries.management.commands.update_country_listing.Command.get_data")
+    def test_update_country_listing(self, mock_get_data):
+        mock_get_data.return_value = [
+            self.nigeria,
+            make_row(1, topLevelDomain=[""]),
+            make_row(2, population=None),
+        ]
+        stdout = StringIO()
+        call_command("update_country_listing", stdout=stdout)
+        self.assertEqual(
+            stdout.getvalue().splitlines(),
+            [
+                "Country 2 - Skipped: population must be an integer",
+                "Region: Region 1 - Created",
+                "Nigeria - Unchanged",
+                "Country 1 - Created",
+            ],
+        )
+        self.assertEqual(
+            Country.objects.get(name="Country 1").to_dict()["topLevelDomain"], []
+        )
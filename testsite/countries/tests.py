@@ -1,10 +1,61 @@
+import fcntl
+import gzip
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from io import StringIO
+from unittest import skipIf
 from unittest.mock import patch
+from uuid import uuid4
 
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
 
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+from countries.cache import get_dataset_version, make_key
+from countries.importer import upsert_countries
+from countries.management.commands.profile_startup import parse_importtime
 from countries.models import Country, Region, RegionStats, TopLevelDomain
+from countries.responses import (
+    choose_encoding,
+    encode_variants,
+    get_encoded_variants,
+    parse_accept_encoding,
+)
+from countries.singleflight import SingleFlight
+from countries.warmup import warm_up
+
+# Keeps test fixtures out of the on-disk cache and lock files the running site
+# uses.
+TEST_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+TEST_LOCK_DIR = os.path.join(tempfile.gettempdir(), "countries-test-locks")
+
+
+def make_row(index, **overrides):
+    row = {
+        "name": f"Country {index}",
+        "alpha2Code": f"C{index % 10}",
+        "alpha3Code": f"C{index % 100:02}",
+        "population": index,
+        "capital": f"Capital {index}",
+        "region": f"Region {index % 5}",
+        "topLevelDomain": [f".c{index}"],
+    }
+    row.update(overrides)
+    return row
 
 
+@override_settings(CACHES=TEST_CACHES, SINGLE_FLIGHT_LOCK_DIR=TEST_LOCK_DIR)
 class CountryViewsTests(TestCase):
     def setUp(self):
         self.client = Client()
@@ -319,6 +370,19 @@ class CountryViewsTests(TestCase):
         }
         self.assertEqual(response.json(), expected_data)
 
+        # SQLite only folds ASCII, and a cached response must not change that.
+        Country.objects.create(
+            name="Åland Islands",
+            alpha2Code="AX",
+            alpha3Code="ALA",
+            population=28875,
+            region=self.region,
+        )
+        response = self.client.get("/countries/name:ÅLAND ISLANDS/")
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get("/countries/name:åland islands/")
+        self.assertEqual(response.status_code, 404)
+
     # Unit Test: Test Region __str__
     def test_region_str(self):
         self.assertEqual(str(self.region), "Africa")
@@ -326,3 +390,396 @@ class CountryViewsTests(TestCase):
     # Unit Test: Test TopLevelDomain __str__
     def test_topleveldomain_str(self):
         self.assertEqual(str(self.tld), ".com")
+
+
+@override_settings(CACHES=TEST_CACHES, SINGLE_FLIGHT_LOCK_DIR=TEST_LOCK_DIR)
+class CountryCacheTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.region = Region.objects.create(name="Africa")
+        self.country = Country.objects.create(
+            name="Nigeria",
+            alpha2Code="NG",
+            alpha3Code="NGA",
+            population=200000,
+            capital="Abuja",
+            region=self.region,
+        )
+
+    # Unit Test: Test stats payload is served from the cache once built
+    def test_stats_payload_cached(self):
+        self.client.get("/countries/stats/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/countries/stats/")
+        self.assertEqual(
+            response.json(),
+            {
+                "regions": [
+                    {
+                        "name": "Africa",
+                        "number_countries": 1,
+                        "total_population": 200000,
+                    }
+                ]
+            },
+        )
+
+    # Unit Test: Test saving a country invalidates the cached stats
+    def test_stats_payload_invalidated_on_save(self):
+        version = get_dataset_version()
+        self.client.get("/countries/stats/")
+        self.country.population = 300000
+        self.country.save()
+        self.assertNotEqual(get_dataset_version(), version)
+        response = self.client.get("/countries/stats/")
+        self.assertEqual(response.json()["regions"][0]["total_population"], 300000)
+
+    # Unit Test: Test changing a country's TLDs invalidates the cached stats
+    def test_dataset_version_bumped_on_tld_change(self):
+        version = get_dataset_version()
+        self.country.topLevelDomain.add(TopLevelDomain.objects.create(name=".ng"))
+        self.assertNotEqual(get_dataset_version(), version)
+
+    # Unit Test: Test warm_up builds the read caches
+    def test_warm_up(self):
+        timings = warm_up()
+        self.assertEqual(set(timings), {"urlconf", "connections", "read_caches"})
+        self.assertIsNotNone(cache.get(make_key("stats:encoded")))
+        lock_path = SingleFlight().lock_path(make_key("stats:encoded"))
+        self.assertEqual(os.path.dirname(lock_path), TEST_LOCK_DIR)
+        self.assertTrue(os.path.exists(lock_path))
+
+    # Unit Test: Test warmed entries outlive the backend's default timeout
+    def test_warm_up_entries_long_lived(self):
+        warm_up()
+        with patch("time.time", return_value=time.time() + 60 * 60):
+            self.assertIsNotNone(cache.get(make_key("stats:encoded")))
+
+
+@override_settings(CACHES=TEST_CACHES, SINGLE_FLIGHT_LOCK_DIR=TEST_LOCK_DIR)
+class PrecompressedResponseTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        rows = [make_row(index, population=1000 * index) for index in range(20)]
+        rows[1]["topLevelDomain"] = [f".c{index}" for index in range(20)]
+        upsert_countries(rows)
+        self.detail_url = "/countries/name:Country 1/"
+
+    # Unit Test: Test Accept-Encoding parsing with q-values
+    def test_parse_accept_encoding(self):
+        self.assertEqual(
+            parse_accept_encoding("gzip;q=0.5, br , identity; q=0, x;q=bad"),
+            {"gzip": 0.5, "br": 1.0, "identity": 0.0, "x": 0.0},
+        )
+
+    # Unit Test: Test encoding negotiation
+    def test_choose_encoding(self):
+        variants = {"identity": b"", "gzip": b"", "br": b""}
+        self.assertEqual(choose_encoding(variants, ""), "identity")
+        self.assertEqual(choose_encoding(variants, "gzip, deflate, br"), "br")
+        self.assertEqual(choose_encoding(variants, "gzip, br;q=0.8"), "gzip")
+        self.assertEqual(choose_encoding(variants, "*"), "br")
+        self.assertEqual(choose_encoding(variants, "br;q=0, *;q=0.5"), "gzip")
+        self.assertEqual(choose_encoding({"identity": b""}, "br"), "identity")
+
+    # Unit Test: Test small bodies are not compressed
+    def test_encode_variants_small_body(self):
+        self.assertEqual(encode_variants({"a": 1}), {"identity": b'{"a": 1}'})
+
+    # Unit Test: Test gzip variant of the stats view
+    def test_stats_view_gzip(self):
+        response = self.client.get("/countries/stats/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+        self.assertEqual(
+            json.loads(gzip.decompress(response.content)),
+            Region.objects.to_dict(),
+        )
+
+    # Unit Test: Test brotli variant of the country detail view
+    @skipIf(brotli is None, "brotli is not installed")
+    def test_detail_view_brotli(self):
+        response = self.client.get(self.detail_url, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        identity = self.client.get(self.detail_url)
+        self.assertFalse(identity.has_header("Content-Encoding"))
+        self.assertEqual(brotli.decompress(response.content), identity.content)
+
+    # Unit Test: Test variants are compressed once per dataset version
+    def test_variants_built_once(self):
+        self.client.get("/countries/stats/", HTTP_ACCEPT_ENCODING="gzip")
+        with patch("countries.responses.gzip.compress") as mock_compress:
+            with self.assertNumQueries(0):
+                self.client.get("/countries/stats/", HTTP_ACCEPT_ENCODING="gzip")
+                self.client.get("/countries/stats/", HTTP_ACCEPT_ENCODING="br")
+        mock_compress.assert_not_called()
+        variants = get_encoded_variants("stats", Region.objects.to_dict)
+        expected = (
+            {"identity", "gzip"} if brotli is None else {"identity", "gzip", "br"}
+        )
+        self.assertEqual(set(variants), expected)
+
+
+@override_settings(CACHES=TEST_CACHES, SINGLE_FLIGHT_LOCK_DIR=TEST_LOCK_DIR)
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.single_flight = SingleFlight(
+            lock_dir=self.tmp_dir, lock_timeout=0.2, poll_interval=0.01
+        )
+        self.key = f"test:single-flight:{uuid4().hex}"
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        time.sleep(0.05)
+        return {"calls": self.calls}
+
+    @contextmanager
+    def lock_held_elsewhere(self):
+        # A separate open file description conflicts just like another process.
+        lock_fd = os.open(
+            self.single_flight.lock_path(self.key), os.O_RDWR | os.O_CREAT
+        )
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(lock_fd)
+
+    # Unit Test: Test concurrent threads share a single computation
+    def test_threads_coalesced(self):
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    self.single_flight.get_or_set(self.key, self.compute)
+                )
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{"calls": 1}] * 8)
+        self.assertEqual(cache.get(self.key), {"calls": 1})
+
+    # Unit Test: Test concurrent processes share a single computation
+    def test_processes_coalesced(self):
+        counter = os.path.join(self.tmp_dir, "calls")
+        caches = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": os.path.join(self.tmp_dir, "cache"),
+            }
+        }
+
+        def compute():
+            with open(counter, "a", encoding="utf-8") as counter_file:
+                counter_file.write("call\n")
+            time.sleep(0.3)
+            return {"pid": os.getpid()}
+
+        context = multiprocessing.get_context("fork")
+        start = context.Event()
+        results = context.Queue()
+
+        def worker():
+            start.wait()
+            single_flight = SingleFlight(
+                lock_dir=self.tmp_dir, lock_timeout=5, poll_interval=0.01
+            )
+            results.put(single_flight.get_or_set(self.key, compute))
+
+        with override_settings(CACHES=caches):
+            processes = [context.Process(target=worker) for _ in range(4)]
+            for process in processes:
+                process.start()
+            start.set()
+            values = [results.get(timeout=10) for _ in processes]
+            for process in processes:
+                process.join()
+
+        with open(counter, encoding="utf-8") as counter_file:
+            self.assertEqual(counter_file.read().splitlines(), ["call"])
+        self.assertEqual(len({value["pid"] for value in values}), 1)
+
+    # Unit Test: Test a stale value is served while another process holds the lock
+    def test_stale_while_locked(self):
+        stale_key = f"{self.key}:stale"
+        cache.set(stale_key, {"calls": 0})
+        with self.lock_held_elsewhere():
+            self.assertEqual(
+                self.single_flight.get_or_set(
+                    self.key, self.compute, stale_key=stale_key
+                ),
+                {"calls": 0},
+            )
+        self.assertEqual(self.calls, 0)
+
+    # Unit Test: Test the stale copy expires
+    def test_stale_value_expires(self):
+        self.single_flight.stale_timeout = 60
+        stale_key = f"{self.key}:stale"
+        with patch("countries.singleflight.cache.set") as mock_set:
+            self.single_flight.get_or_set(self.key, self.compute, stale_key=stale_key)
+        mock_set.assert_called_with(stale_key, {"calls": 1}, 60)
+
+    # Unit Test: Test the value is computed anyway once the lock wait times out
+    def test_lock_timeout_takeover(self):
+        with self.lock_held_elsewhere():
+            self.assertEqual(
+                self.single_flight.get_or_set(self.key, self.compute), {"calls": 1}
+            )
+
+    # Unit Test: Test errors reach every waiter and release the lock
+    def test_error_propagated(self):
+        def compute():
+            time.sleep(0.05)
+            raise Country.DoesNotExist()
+
+        errors = []
+
+        def call():
+            try:
+                self.single_flight.get_or_set(self.key, compute)
+            except Country.DoesNotExist as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 4)
+        self.assertIsNone(cache.get(self.key))
+        self.assertEqual(
+            self.single_flight.get_or_set(self.key, self.compute), {"calls": 1}
+        )
+
+
+@override_settings(CACHES=TEST_CACHES, SINGLE_FLIGHT_LOCK_DIR=TEST_LOCK_DIR)
+class RegionDetailTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.region = Region.objects.create(name="Africa")
+        Region.objects.create(name="Europe")
+        tld = TopLevelDomain.objects.create(name=".com")
+        for name, population in (("Nigeria", 200000), ("Ghana", 30000), ("Kenya", 5)):
+            country = Country.objects.create(
+                name=name,
+                alpha2Code=name[:2].upper(),
+                alpha3Code=name[:3].upper(),
+                population=population,
+                region=self.region,
+            )
+            country.topLevelDomain.add(tld)
+
+    # Unit Test: Test region detail view returns stats and countries by name
+    def test_region_detail_view(self):
+        response = self.client.get("/countries/region:africa/")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertNotIn("pagination", data)
+        self.assertEqual(data["region"]["name"], "Africa")
+        self.assertEqual(data["region"]["number_countries"], 3)
+        self.assertEqual(data["region"]["total_population"], 230005)
+        self.assertEqual(
+            [country["name"] for country in data["region"]["countries"]],
+            ["Ghana", "Kenya", "Nigeria"],
+        )
+        self.assertEqual(
+            data["region"]["countries"][0],
+            {
+                "name": "Ghana",
+                "alpha2Code": "GH",
+                "alpha3Code": "GHA",
+                "population": 30000,
+                "capital": "",
+                "region": "Africa",
+                "topLevelDomain": [".com"],
+            },
+        )
+
+    # Unit Test: Test a cached region lookup does not answer for a name SQLite tells apart
+    def test_region_detail_view_non_ascii_case(self):
+        Region.objects.create(name="Éire")
+        self.assertEqual(self.client.get("/countries/region:ÉIRE/").status_code, 200)
+        self.assertEqual(self.client.get("/countries/region:éire/").status_code, 404)
+
+    # Unit Test: Test region detail view pagination
+    def test_region_detail_view_paginated(self):
+        response = self.client.get("/countries/region:Africa/?page=2&page_size=2")
+        data = response.json()
+        self.assertEqual(
+            data["pagination"], {"page": 2, "page_size": 2, "num_pages": 2}
+        )
+        self.assertEqual(data["region"]["number_countries"], 3)
+        self.assertEqual(
+            [country["name"] for country in data["region"]["countries"]], ["Nigeria"]
+        )
+
+    # Unit Test: Test region detail view for a region without countries
+    def test_region_detail_view_empty_region(self):
+        response = self.client.get("/countries/region:Europe/")
+        self.assertEqual(
+            response.json(),
+            {
+                "region": {
+                    "name": "Europe",
+                    "number_countries": 0,
+                    "total_population": 0,
+                    "countries": [],
+                }
+            },
+        )
+
+    # Unit Test: Test region detail view errors
+    def test_region_detail_view_errors(self):
+        response = self.client.get("/countries/region:Atlantis/")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {"error": "Region not found"})
+        for query in ("page=0&page_size=2", "page_size=x", "page_size=101"):
+            response = self.client.get(f"/countries/region:Africa/?{query}")
+            self.assertEqual(response.status_code, 400)
+        for page in (3, 10**30):
+            response = self.client.get(
+                f"/countries/region:Africa/?page={page}&page_size=2"
+            )
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json(), {"error": "Page not found"})
+        response = self.client.get("/countries/region:Europe/?page=1&page_size=2")
+        self.assertEqual(
+            response.json()["pagination"], {"page": 1, "page_size": 2, "num_pages": 1}
+        )
+
+
+class ProfileStartupTests(TestCase):
+    # Unit Test: Test parsing of -X importtime output
+    def test_parse_importtime(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     _io\n"
+            "import time:      2500 |       4000 | django\n"
+        )
+        self.assertEqual(
+            parse_importtime(output),
+            [
+                {"module": "_io", "self_us": 120, "cumulative_us": 120},
+                {"module": "django", "self_us": 2500, "cumulative_us": 4000},
+            ],
+        )
+
+    # Unit Test: Test profile_startup command reports the wsgi import breakdown
+    def test_profile_startup_command(self):
+        stdout = StringIO()
+        call_command("profile_startup", "wsgi", limit=3, stdout=stdout)
+        lines = stdout.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith("wsgi: "))
+        self.assertEqual(len(lines), 5)
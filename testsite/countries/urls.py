@@ -6,4 +6,6 @@ urlpatterns = [
     path("stats/", views.stats),
     path("id:<country_id>/", views.detail),
     path("name:<country_name>/", views.detail),
+    path("region:<region_name>/", views.region_detail),
+    path("upsert/", views.upsert),
 ]
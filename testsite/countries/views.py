@@ -1,26 +1,129 @@
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.core.paginator import EmptyPage
 from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
+from .importer import parse_batch, rejected_batch, upsert_countries, validate_rows
 from .models import Country, Region
+from .responses import precompressed_json_response
 
+MAX_PAGE_SIZE = 100
 
-def stats(_):
-    regions = Region.objects.get_stats()
-    response = {"regions": [region.to_dict() for region in regions]}
 
-    return JsonResponse(response)
+def stats(request):
+    return precompressed_json_response(request, "stats", Region.objects.to_dict)
 
 
-def detail(_, country_id=None, country_name=None):
+def detail(request, country_id=None, country_name=None):
     response = None
     try:
         countries = Country.objects
         if country_id:
             countries = countries.filter(id=country_id)
-        elif country_name:
+            key = f"country:id:{country_id}"
+        else:
             countries = countries.filter(name__iexact=country_name)
-        country = countries.get()
-        response = JsonResponse({"country": country.to_dict()})
+            # Keyed on the name as given: SQLite's iexact only folds ASCII,
+            # so str.lower() would merge names the lookup tells apart.
+            key = f"country:name:{country_name}"
+        response = precompressed_json_response(
+            request, key, lambda: {"country": countries.get().to_dict()}
+        )
     except Country.DoesNotExist:
         response = JsonResponse({"error": "Country not found"}, status=404)
 
     return response
+
+
+def parse_page(params):
+    page = int(params.get("page", 1))
+    page_size = int(params["page_size"]) if "page_size" in params else None
+    if page < 1 or (page_size is not None and not 1 <= page_size <= MAX_PAGE_SIZE):
+        raise ValueError
+    return page, page_size
+
+
+def region_detail(request, region_name):
+    try:
+        page, page_size = parse_page(request.GET)
+    except ValueError:
+        return JsonResponse(
+            {
+                "error": "page must be a positive integer and page_size "
+                f"an integer from 1 to {MAX_PAGE_SIZE}"
+            },
+            status=400,
+        )
+
+    # Not lower()ed, for the same reason as the country name key in detail().
+    key = f"region:{region_name}"
+    if page_size:
+        key = f"{key}:{page}:{page_size}"
+    try:
+        response = precompressed_json_response(
+            request,
+            key,
+            lambda: Region.objects.get_detail(region_name, page, page_size),
+        )
+    except Region.DoesNotExist:
+        response = JsonResponse({"error": "Region not found"}, status=404)
+    except EmptyPage:
+        response = JsonResponse({"error": "Page not found"}, status=404)
+
+    return response
+
+
+def has_valid_token(request):
+    scheme, _, token = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+    expected = settings.COUNTRIES_API_TOKEN
+    return (
+        bool(expected)
+        and scheme.lower() == "bearer"
+        and hmac.compare_digest(token.strip().encode(), expected.encode())
+    )
+
+
+def read_body(request, max_bytes):
+    """Reads the request body, bypassing DATA_UPLOAD_MAX_MEMORY_SIZE."""
+    try:
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        length = 0
+    if length > max_bytes:
+        raise RequestDataTooBig
+    body = request.read(max_bytes + 1)
+    if len(body) > max_bytes:
+        raise RequestDataTooBig
+    return body
+
+
+@csrf_exempt
+@require_POST
+def upsert(request):
+    if not has_valid_token(request):
+        response = JsonResponse({"error": "Invalid or missing API token"}, status=401)
+        response["WWW-Authenticate"] = "Bearer"
+        return response
+
+    max_bytes = settings.COUNTRIES_UPSERT_MAX_BYTES
+    try:
+        body = read_body(request, max_bytes)
+    except RequestDataTooBig:
+        return JsonResponse(
+            {"error": f"Request body is larger than {max_bytes} bytes"}, status=413
+        )
+
+    try:
+        rows = parse_batch(body, request.content_type)
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    errors = validate_rows(rows)
+    if any(errors):
+        return JsonResponse(rejected_batch(rows, errors).to_dict(), status=400)
+
+    return JsonResponse(upsert_countries(rows).to_dict())
@@ -0,0 +1,61 @@
+import logging
+import os
+import time
+from typing import Callable, Dict
+
+from django.db import connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def import_urlconf():
+    # Accessing url_patterns imports the URLconf and every view module it
+    # references; populating reverse_dict compiles the route patterns.
+    resolver = get_resolver()
+    resolver.url_patterns  # pylint: disable=pointless-statement
+    resolver.reverse_dict  # pylint: disable=pointless-statement
+
+
+def prime_connections():
+    for connection in connections.all():
+        connection.ensure_connection()
+
+
+def prime_read_caches():
+    # pylint: disable=import-outside-toplevel
+    from .models import Country, Region
+    from .responses import get_encoded_variants
+
+    get_encoded_variants("stats", Region.objects.to_dict)
+    # Touch every page the detail view reads so SQLite's page cache is hot.
+    list(Country.objects.select_related("region").prefetch_related("topLevelDomain"))
+
+
+STAGES: Dict[str, Callable[[], None]] = {
+    "urlconf": import_urlconf,
+    "connections": prime_connections,
+    "read_caches": prime_read_caches,
+}
+
+
+def warm_up() -> Dict[str, float]:
+    timings = {}
+    for name, stage in STAGES.items():
+        started = time.perf_counter()
+        stage()
+        timings[name] = time.perf_counter() - started
+        logger.info("Warm-up stage %s took %.1fms", name, timings[name] * 1000)
+    return timings
+
+
+def post_fork(server, worker):  # pylint: disable=unused-argument
+    """gunicorn ``post_fork`` hook: ``from countries.warmup import post_fork``."""
+    import django  # pylint: disable=import-outside-toplevel
+
+    # Without --preload gunicorn forks before testsite.wsgi sets this.
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "testsite.settings")
+    django.setup()
+    # Connections opened by a preloaded master must not be shared with forks.
+    connections.close_all()
+    warm_up()
@@ -37,7 +37,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
-    "countries",
+    "countries.apps.CountriesConfig",
 ]
 
 MIDDLEWARE = [
@@ -82,6 +82,39 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+# File-based so that every worker and management command share one cache and
+# see the same dataset version.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(BASE_DIR, ".cache"),
+        # Well above what the dataset needs (two entries per country), so
+        # culling never drops the dataset version key.
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+
+# Lock files used by countries.singleflight to let one process at a time
+# rebuild a cold cache entry.
+SINGLE_FLIGHT_LOCK_DIR = os.path.join(BASE_DIR, ".cache", "locks")
+
+# Run countries.warmup.warm_up() when the WSGI application is loaded, so new
+# workers do not serve their first requests cold.
+WARM_UP_ON_STARTUP = os.environ.get("DJANGO_WARM_UP", "") == "1"
+
+# Bearer token required by POST /countries/upsert/; the endpoint refuses every
+# request while this is empty.
+COUNTRIES_API_TOKEN = os.environ.get("COUNTRIES_API_TOKEN", "")
+
+# Largest request body POST /countries/upsert/ accepts, checked instead of the
+# global DATA_UPLOAD_MAX_MEMORY_SIZE (2.5 MB). A feed record is about 2 KB, so
+# this allows batches of roughly 15,000 records.
+COUNTRIES_UPSERT_MAX_BYTES = 32 * 1024 * 1024
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 